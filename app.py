@@ -5,46 +5,135 @@ import pydeck as pdk
 import matplotlib.pyplot as plt
 from wordcloud import WordCloud
 from datetime import datetime
+import os
+import tempfile
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import altair as alt
 
-# Function to load data
-@st.cache_data
-def load_data(start_date=None, end_date=None):
-    # Load the dataset
-    data = pd.read_csv('Cleaned_Open311.csv')
-    # Convert datetime fields to datetime objects
-    data['requested_datetime'] = pd.to_datetime(data['requested_datetime'])
-    data['updated_datetime'] = pd.to_datetime(data['updated_datetime'])
-    data['closed_date'] = pd.to_datetime(data['closed_date'])
-    data['resolution_days'] = (data['closed_date'] - data['requested_datetime']).dt.days
-
-    # Filter data based on the date range provided
-    if start_date is not None and end_date is not None:
-        data = data[(data['requested_datetime'].dt.date >= start_date) & 
-                    (data['requested_datetime'].dt.date <= end_date)]
-    else:
-        # Default to loading data from the current year
-        current_year = datetime.now().year
-        data = data[data['requested_datetime'].dt.year == current_year]
-
-    return data
-
-def plot_service_requests_over_time(data, selected_types=None):
-    # Prepare the data
-    data['month_year'] = data['requested_datetime'].dt.to_period('M').dt.to_timestamp()
-    
+CSV_PATH = 'Cleaned_Open311.csv'
+PARQUET_PATH = 'Cleaned_Open311.parquet'
+
+# Columns needed by the dashboard; 'description' feeds the map tooltip and the word cloud
+DEFAULT_COLUMNS = ['service_name', 'description', 'lat', 'long', 'status_description',
+                   'requested_datetime', 'closed_date']
+
+# Largest number of points sent to the browser for the scatterplot map
+MAX_MAP_POINTS = 20_000
+# Number of lat/long bins per axis for the heatmap grid (~5k cells)
+HEATMAP_BINS = 70
+
+# Columns used to build the scatterplot map tooltip
+MAP_COLUMNS = ['lat', 'long', 'service_name', 'description', 'status_description',
+               'requested_datetime', 'closed_date']
+
+MONTHS_ORDER = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+                'August', 'September', 'October', 'November', 'December']
+
+# One-time conversion of the cleaned CSV to Parquet with typed timestamp columns
+def convert_to_parquet(csv_path=CSV_PATH, parquet_path=PARQUET_PATH):
+    data = pd.read_csv(csv_path)
+    # The timestamps are ISO 8601, so an explicit format keeps parsing on pandas' fast path
+    for column in ('requested_datetime', 'updated_datetime', 'closed_date'):
+        data[column] = pd.to_datetime(data[column], format='ISO8601', errors='coerce', cache=True).astype('datetime64[ns]')
+    table = pa.Table.from_pandas(data, preserve_index=False)
+
+    # Write to a temporary file and move it into place, so other sessions never read a partial file
+    fd, tmp_path = tempfile.mkstemp(suffix='.parquet', dir=os.path.dirname(os.path.abspath(parquet_path)))
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp_path, row_group_size=100_000, compression='zstd')
+        os.replace(tmp_path, parquet_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+# Rebuild the Parquet file when the CSV has been updated since the last conversion,
+# and return its modification time as the version of the data. The CSV is optional
+# once the Parquet file exists.
+def data_version():
+    if not os.path.exists(PARQUET_PATH):
+        convert_to_parquet()
+    elif os.path.exists(CSV_PATH) and os.path.getmtime(CSV_PATH) > os.path.getmtime(PARQUET_PATH):
+        convert_to_parquet()
+    return os.path.getmtime(PARQUET_PATH)
+
+# Function to load the full dataset once; date filtering happens in memory on the cached frame.
+# The cache is persisted to disk so it survives server restarts. Disk caches ignore ttl, so the
+# data version is part of the cache key instead and a new Parquet file gets a new entry.
+@st.cache_data(persist="disk", max_entries=4)
+def _load_all(version):
+    table = pq.read_table(PARQUET_PATH, columns=DEFAULT_COLUMNS)
+    # Requests without a request date can never fall inside a date range; drop them here so
+    # their epoch day cannot default to 0 (1970-01-01) in the filters and the cube
+    table = table.filter(pc.is_valid(table['requested_datetime']))
+
+    data = table.to_pandas()
+
+    # Resolution time in whole days as nullable int32; requests that are still open are missing
+    elapsed = (data['closed_date'].values - data['requested_datetime'].values).astype('timedelta64[D]')
+    data['resolution_days'] = pd.arrays.IntegerArray(elapsed.view('i8').astype('i4'), np.isnat(elapsed))
+
+    # Low-cardinality text columns are dictionary-encoded
+    for column in ('service_name', 'status_description'):
+        data[column] = data[column].astype('category')
+    # Request date as int32 days since the epoch, so date filtering is a plain integer compare
+    data['_req_epoch_day'] = data['requested_datetime'].values.astype('datetime64[D]').view('i8').astype('i4')
+    return data, build_cube(data), data['service_name'].cat.categories.tolist()
+
+# Convert a date to days since the epoch
+def to_epoch_day(d):
+    return int(np.datetime64(d, 'D').astype('i8'))
+
+# Function to filter the cached data to an inclusive range of epoch days
+def filter_by_date(data, first_day, last_day):
+    days = data['_req_epoch_day'].to_numpy()
+    mask = (days >= first_day) & (days <= last_day)
+    return data.iloc[np.flatnonzero(mask)]
+
+# Function to build the aggregate cube the charts read from: one row per request day and
+# service type with the number of requests, the summed resolution days and the number closed.
+# Arrow's hash aggregation does the single pass over the raw rows and keeps requests without
+# a service type as their own group, so chart totals match the raw data.
+def build_cube(data):
+    table = pa.Table.from_pandas(data[['_req_epoch_day', 'service_name', 'resolution_days']], preserve_index=False)
+    cube = table.group_by(['_req_epoch_day', 'service_name']).aggregate([
+        ([], 'count_all'),
+        ('resolution_days', 'sum'),
+        ('resolution_days', 'count'),
+    ]).to_pandas()
+    cube = cube.rename(columns={'count_all': 'cnt', 'resolution_days_sum': 'sum_days', 'resolution_days_count': 'n_closed'})
+    # Groups with no closed requests sum to null; store plain int64 columns
+    cube['sum_days'] = cube['sum_days'].fillna(0)
+    for column in ('cnt', 'sum_days', 'n_closed'):
+        cube[column] = cube[column].astype('int64')
+
+    # Month buckets for the charts, truncated once here with numpy datetime64 casts: the first
+    # day of the month as a timestamp and the calendar month (1-12)
+    months = cube['_req_epoch_day'].to_numpy().astype('datetime64[D]').astype('datetime64[M]')
+    cube['month_year'] = months.astype('datetime64[ns]')
+    cube['month'] = (months.view('i8') % 12 + 1).astype('i1')
+    return cube
+
+# Charts are cached on a signature of the filter state and read the filtered aggregate cube;
+# the leading underscore keeps Streamlit from hashing the cube itself
+@st.cache_data(max_entries=32)
+def plot_service_requests_over_time(signature, _cube, selected_types=None):
+    cube = _cube
     # If specific service types are selected, filter the data
     if selected_types:
-        data = data[data['service_name'].isin(selected_types)]
-    
+        cube = cube[cube['service_name'].isin(selected_types)]
+
     # Aggregate data - if specific types are selected, group by type; otherwise, sum all requests
     if selected_types and len(selected_types) > 1:
-        service_monthly = data.groupby(['month_year', 'service_name']).size().reset_index(name='count')
+        service_monthly = cube.groupby(['month_year', 'service_name'], observed=True)['cnt'].sum().reset_index(name='count')
+        service_monthly['service_name'] = service_monthly['service_name'].astype(str)
         color_scale = alt.Color('service_name:N', legend=alt.Legend(title="Service Type"))
     else:
-        service_monthly = data.groupby('month_year').size().reset_index(name='count')
+        service_monthly = cube.groupby('month_year')['cnt'].sum().reset_index(name='count')
         color_scale = alt.value('steelblue')  # Single color if no specific types are selected
-    
+
     # Create a line chart
     line_chart = alt.Chart(service_monthly).mark_line().encode(
         x=alt.X('month_year:T', title='Month/Year'),
@@ -57,20 +146,21 @@ def plot_service_requests_over_time(data, selected_types=None):
 
     return line_chart
 
-def plot_avg_response_time_by_month(data):
-    # Prepare the data
-    data['month'] = data['requested_datetime'].dt.month_name()
-    avg_response_time_by_month = data.groupby('month')['resolution_days'].mean().reset_index()
+@st.cache_data(max_entries=32)
+def plot_avg_response_time_by_month(signature, _cube):
+    cube = _cube
+    # Prepare the data, aggregating on the integer month (1-12)
+    by_month = cube.groupby('month')[['sum_days', 'n_closed']].sum()
 
-    # Sort by month order
-    months_order = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
-                    'August', 'September', 'October', 'November', 'December']
-    avg_response_time_by_month['month'] = pd.Categorical(avg_response_time_by_month['month'], categories=months_order, ordered=True)
-    avg_response_time_by_month = avg_response_time_by_month.sort_values('month')
+    # Label the (at most 12) months with requests; all-open months average to NaN
+    avg_response_time_by_month = pd.DataFrame({
+        'month': [MONTHS_ORDER[month - 1] for month in by_month.index],
+        'resolution_days': (by_month['sum_days'] / by_month['n_closed']).to_numpy(),
+    })
 
     # Create a bar chart
     bar_chart = alt.Chart(avg_response_time_by_month).mark_bar().encode(
-        x=alt.X('month:O', title='Month', sort=months_order),  # Add sort parameter to enforce month order
+        x=alt.X('month:O', title='Month', sort=MONTHS_ORDER),  # Add sort parameter to enforce month order
         y=alt.Y('resolution_days:Q', title='Average Response Time (Days)')
     ).properties(
         title='Average Response Time by Month'
@@ -79,9 +169,34 @@ def plot_avg_response_time_by_month(data):
     return bar_chart
 
 
+# Function to sum resolution days on a coarse lat/long grid for the heatmap
+def aggregate_heatmap_grid(data, bins=HEATMAP_BINS):
+    # Requests without coordinates cannot be placed on the grid
+    data = data.dropna(subset=['lat', 'long'])
+    if data.empty:
+        return pd.DataFrame({'lat': [], 'long': [], 'resolution_days': []})
+
+    lat_bins, lat_edges = pd.cut(data['lat'], bins, labels=False, retbins=True)
+    long_bins, long_edges = pd.cut(data['long'], bins, labels=False, retbins=True)
+    grid = data['resolution_days'].groupby([lat_bins, long_bins]).sum().reset_index()
+
+    # Place each cell at the centre of its bin
+    lat_centres = (lat_edges[:-1] + lat_edges[1:]) / 2
+    long_centres = (long_edges[:-1] + long_edges[1:]) / 2
+    grid['lat'] = lat_centres[grid['lat'].astype(int)]
+    grid['long'] = long_centres[grid['long'].astype(int)]
+    return grid
+
 # Function to generate a word cloud from the request descriptions
 def generate_word_cloud(data, column='description'):
-    text = ' '.join(description for description in data[column].astype(str))
+    # Drop missing and empty descriptions, then join the rest in one Arrow kernel call
+    descriptions = pc.drop_null(pa.array(data[column], from_pandas=True).cast(pa.string()))
+    descriptions = pc.filter(descriptions, pc.not_equal(descriptions, ''))
+    text = pc.binary_join(pa.ListArray.from_arrays([0, len(descriptions)], descriptions), ' ')[0].as_py()
+    if not text:
+        st.write("No descriptions available for the selected filters.")
+        return
+
     wordcloud = WordCloud(width=800, height=400, background_color ='white').generate(text)
     
     # Display the generated WordCloud
@@ -92,11 +207,9 @@ def generate_word_cloud(data, column='description'):
 
 # Function to calculate average response time
 def calculate_avg_response_time(data):
-    # Filter out data where either requested or closed date is missing
-    filtered_data = data.dropna(subset=['requested_datetime', 'closed_date'])
-    # Calculate response time in days
-    response_time = (filtered_data['closed_date'] - filtered_data['requested_datetime']).dt.days
-    return response_time.mean()
+    # resolution_days is already computed at load time; open requests are missing and skipped
+    avg_response_time = data['resolution_days'].mean()
+    return float('nan') if pd.isna(avg_response_time) else float(avg_response_time)
 
 
 # Main app
@@ -114,93 +227,109 @@ def main():
     start_date = st.sidebar.date_input("Start Date", value=default_start_date, min_value=min_date, max_value=max_date, key='start_date')
     end_date = st.sidebar.date_input("End Date", value=max_date, min_value=min_date, max_value=max_date, key='end_date')
 
-    # Load data based on selected date range or default to the current year
-    data = load_data(start_date, end_date)
+    # Filter the cached data to the selected date range
+    version = data_version()
+    df_all, cube_all, all_services = _load_all(version)
+    # The sidebar range is the single source of truth for the row filter, the cube filter
+    # and the chart cache signature
+    first_day, last_day = to_epoch_day(start_date), to_epoch_day(end_date)
+    data = filter_by_date(df_all, first_day, last_day)
+    cube = filter_by_date(cube_all, first_day, last_day)
 
     # Sidebar for filters
     st.sidebar.title("Filters")
-    request_type = st.sidebar.multiselect("Select Request Type", options=data['service_name'].unique())
-
-    # Ensure default dates are within the range of the data
-    min_date = data['requested_datetime'].min().date()
-    max_date = data['requested_datetime'].max().date()
-    default_start = min_date
-    default_end = max_date if max_date > min_date else min_date
-
-    start_date = st.sidebar.date_input("Start Date", value=default_start, min_value=min_date, max_value=max_date)
-    end_date = st.sidebar.date_input("End Date", value=default_end, min_value=start_date, max_value=max_date)
+    request_type = st.sidebar.multiselect("Select Request Type", options=all_services)
 
     # Filtering data based on selection
     if request_type:
         data = data[data['service_name'].isin(request_type)]
-    data = data[(data['requested_datetime'].dt.date >= start_date) & (data['requested_datetime'].dt.date <= end_date)]
+        cube = cube[cube['service_name'].isin(request_type)]
 
     #Heatmap
     st.sidebar.title("Map Type")
     use_heatmap = st.sidebar.checkbox("Show Heatmap")
-    # Display 
-    if not data.empty:
-        # Tooltip configuration for the map
-        data['requested_datetime_str'] = data['requested_datetime'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        data['closed_date_str'] = data['closed_date'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        tooltip = {
-            "html": "<b>Service Name:</b> {service_name}<br/>"
-                    "<b>Description:</b> {description}<br/>"
-                    "<b>Status:</b> {status_description}<br/>"
-                    "<b>Requested:</b> {requested_datetime_str}<br/>"
-                    "<b>Closed:</b> {closed_date_str}",
-            "style": {
-                "backgroundColor": "steelblue",
-                "color": "white"
-            }
-        }
-
-        # Define layers based on heatmap checkbox
-        layers = []
-        if use_heatmap:
-            # Create a heatmap layer if the checkbox is checked
-            heatmap_layer = pdk.Layer(
-                "HeatmapLayer",
-                data=data,
-                get_position=['long', 'lat'],
-                opacity=0.5,
-                get_weight="resolution_days",  # Weight based on resolution days
-                color_range=[
-            [0, 0, 255],     # Blue for lowest values
-            [0, 255, 0],     # Green for low to medium values
-            [255, 255, 0],   # Yellow for medium to high values
-            [255, 0, 0]      # Red for the highest values
-        ],
-        threshold=0.05,    # Fine-tune this for your data
-        radius_pixels=30,
-            )
-            layers.append(heatmap_layer)
-        else:
-            # Create a scatterplot layer if the checkbox is not checked
-            scatterplot_layer = pdk.Layer(
-                'ScatterplotLayer',
-                data=data,
-                get_position=['long', 'lat'],
-                get_color=[200, 30, 0, 160],
-                get_radius=50,
-                pickable=True
-            )
-            layers.append(scatterplot_layer)
-
-        # Map rendering with layers
-        st.pydeck_chart(pdk.Deck(
-            map_style='mapbox://styles/mapbox/streets-v12',
-            initial_view_state=pdk.ViewState(
-                latitude=data['lat'].mean(),
-                longitude=data['long'].mean(),
-                zoom=11,
-            ),
-            layers=layers,  # Use layers list here
-            tooltip=tooltip
-        ))
 
+    # Nothing else to draw when the filters leave no requests
+    if data.empty:
+        st.info("No data for selected filters.")
+        st.stop()
+
+    # Identifies the filtered data for the cached charts
+    signature = (version, first_day, last_day, tuple(request_type), len(data))
+
+    # Tooltip configuration for the map
+    tooltip = {
+        "html": "<b>Service Name:</b> {service_name}<br/>"
+                "<b>Description:</b> {description}<br/>"
+                "<b>Status:</b> {status_description}<br/>"
+                "<b>Requested:</b> {requested_datetime_str}<br/>"
+                "<b>Closed:</b> {closed_date_str}",
+        "style": {
+            "backgroundColor": "steelblue",
+            "color": "white"
+        }
+    }
+
+    # Define layers based on heatmap checkbox
+    layers = []
+    if use_heatmap:
+        # Create a heatmap layer if the checkbox is checked
+        heatmap_layer = pdk.Layer(
+            "HeatmapLayer",
+            data=aggregate_heatmap_grid(data),
+            get_position=['long', 'lat'],
+            opacity=0.5,
+            get_weight="resolution_days",  # Weight based on summed resolution days per grid cell
+            color_range=[
+        [0, 0, 255],     # Blue for lowest values
+        [0, 255, 0],     # Green for low to medium values
+        [255, 255, 0],   # Yellow for medium to high values
+        [255, 0, 0]      # Red for the highest values
+    ],
+    threshold=0.05,    # Fine-tune this for your data
+    radius_pixels=30,
+        )
+        layers.append(heatmap_layer)
     else:
-        st.write("No data available for the selected filters.")
+        # Send only the tooltip columns, and a fixed sample of rows for large selections
+        map_df = data[MAP_COLUMNS]
+        if len(map_df) > MAX_MAP_POINTS:
+            sample = np.random.default_rng(0).choice(len(map_df), MAX_MAP_POINTS, replace=False)
+            map_df = map_df.iloc[np.sort(sample)]
+
+        # Build the layer data column by column: one [long, lat] position list per point plus
+        # plain object arrays for the tooltip, with dates formatted for the mapped rows only
+        layer_df = pd.DataFrame({
+            'position': np.column_stack([map_df['long'].to_numpy(), map_df['lat'].to_numpy()]).tolist(),
+            'service_name': map_df['service_name'].to_numpy(),
+            'description': map_df['description'].to_numpy(),
+            'status_description': map_df['status_description'].to_numpy(),
+            'requested_datetime_str': map_df['requested_datetime'].dt.strftime('%Y-%m-%d %H:%M:%S').to_numpy(),
+            'closed_date_str': map_df['closed_date'].dt.strftime('%Y-%m-%d %H:%M:%S').to_numpy(),
+        })
+
+        # Create a scatterplot layer if the checkbox is not checked
+        scatterplot_layer = pdk.Layer(
+            'ScatterplotLayer',
+            data=layer_df,
+            get_position='position',
+            get_color=[200, 30, 0, 160],
+            get_radius=50,
+            pickable=True
+        )
+        layers.append(scatterplot_layer)
+
+    # Map rendering with layers
+    st.pydeck_chart(pdk.Deck(
+        map_style='mapbox://styles/mapbox/streets-v12',
+        initial_view_state=pdk.ViewState(
+            latitude=data['lat'].mean(),
+            longitude=data['long'].mean(),
+            zoom=11,
+        ),
+        layers=layers,  # Use layers list here
+        tooltip=tooltip
+    ))
 
     
     # Summary statistics
@@ -215,26 +344,27 @@ def main():
     st.metric(label="Average Response Time (Days)", value=f"{avg_response_time:.2f}")
 
     # Number of unique request types
-    unique_request_types = data['service_name'].nunique()
+    unique_request_types = data['service_name'].cat.remove_unused_categories().cat.categories.size
     st.metric(label="Unique Request Types", value=unique_request_types)
 
 
     st.header("Temporal Analysis")
     selected_service_types = st.multiselect(
         'Select Service Types', 
-        options=data['service_name'].unique(),
+        options=all_services,
         default=None
     )
 # Plot the service requests over time
-    service_requests_line_chart = plot_service_requests_over_time(data, selected_service_types)
+    service_requests_line_chart = plot_service_requests_over_time(signature, cube, selected_service_types)
     st.altair_chart(service_requests_line_chart, use_container_width=True)
     # Plot the average response time by month
-    avg_response_time_bar_chart = plot_avg_response_time_by_month(data)
+    avg_response_time_bar_chart = plot_avg_response_time_by_month(signature, cube)
     st.altair_chart(avg_response_time_bar_chart, use_container_width=True)
 
     # Interactive bar chart of number of requests by service type
     st.header("Number of Requests by Service Type")
-    requests_by_service_type = data['service_name'].value_counts().reset_index()
+    # Requests without a service type are left out, as value_counts() did
+    requests_by_service_type = cube.groupby('service_name', observed=True)['cnt'].sum().reset_index()
     requests_by_service_type.columns = ['service_name', 'count']
     requests_by_service_type = requests_by_service_type.sort_values('count', ascending=False)
 
@@ -1,15 +1,55 @@
 import streamlit as st
-import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import pyarrow as pa
+import pyarrow.compute as pc
 import pydeck as pdk
 
-# Function to load data from the API
-@st.cache_data
+API_URL = 'https://bloomington.data.socrata.com/resource/aw6y-t4ix.json'
+# Rows requested per page; the API returns only 1000 rows when no limit is given
+PAGE_SIZE = 50000
+# Seconds to wait for connecting to the API and for each page to arrive
+REQUEST_TIMEOUT = (5, 60)
+# Retry connection failures and throttling/server errors with backoff
+RETRY = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+
+# The only fields load_data keeps: the map coordinates, which the API normally returns as JSON
+# strings; load_data stringifies any other JSON value so the schema always applies
+SCHEMA = pa.schema([('lat', pa.string()), ('long', pa.string())])
+NUMBER_PATTERN = r'^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$'
+
+# Parse a string column to float64, ignoring surrounding whitespace and turning non-numeric
+# values into nulls
+def to_float(column):
+    column = pc.utf8_trim_whitespace(column)
+    numeric = pc.match_substring_regex(column, NUMBER_PATTERN)
+    return pc.cast(pc.if_else(numeric, column, pa.scalar(None, pa.string())), pa.float64())
+
+# Function to load the request coordinates (lat/long only) from the API, following
+# pagination over one keep-alive session
+@st.cache_data(ttl=600)
 def load_data():
-    API_URL = 'https://bloomington.data.socrata.com/resource/aw6y-t4ix.json'
-    response = requests.get(API_URL)
-    data = response.json()
-    return pd.DataFrame(data)
+    rows = []
+    offset = 0
+    with requests.Session() as session:
+        session.mount('https://', HTTPAdapter(max_retries=RETRY))
+        while True:
+            response = session.get(API_URL, params={'$limit': PAGE_SIZE, '$offset': offset, '$order': ':id'},
+                                   timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            page = response.json()
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                break
+            offset += len(page)
+
+    # Coordinates sent as JSON numbers would not fit the string schema; stringify them so
+    # to_float parses every row the same way
+    rows = [{name: None if row.get(name) is None else str(row[name]) for name in SCHEMA.names} for row in rows]
+    table = pa.Table.from_pylist(rows, schema=SCHEMA)
+    table = pa.table({name: to_float(table[name]) for name in SCHEMA.names})
+    return table.to_pandas()
 
 # Function to plot the map using PyDeck
 def plot_map(dataframe):
@@ -41,10 +81,6 @@ def main():
 
     df = load_data()
 
-    # Convert latitude and longitude to numeric
-    df['lat'] = pd.to_numeric(df['lat'], errors='coerce')
-    df['long'] = pd.to_numeric(df['long'], errors='coerce')
-
     map = plot_map(df)
 
     st.pydeck_chart(map)